@@ -1,6 +1,5 @@
 from dataclasses import dataclass
 import numpy as np
-from scipy.linalg import sqrtm
 import logging
 
 from netsquid.components.qdetector import QuantumDetector, QuantumDetectorError
@@ -12,6 +11,29 @@ from netsquid.util.simtools import sim_time
 from netsquid.util.simlog import logger
 
 
+def _psd_sqrtm(matrix):
+    """Square root of a positive semi-definite Hermitian matrix.
+
+    The POVM elements the detector operators are built from are Hermitian and positive semi-definite, so their
+    square root follows directly from an eigendecomposition. This is cheaper than a general matrix square root and
+    returns an exactly Hermitian result.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        Positive semi-definite Hermitian matrix.
+
+    Returns
+    -------
+    numpy.ndarray
+        The positive semi-definite square root of `matrix`.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+    # Clip round-off that pushes zero eigenvalues slightly negative
+    root = np.sqrt(np.clip(eigenvalues, 0, None))
+    return (eigenvectors * root) @ eigenvectors.conj().T
+
+
 @dataclass
 class BSMOutcome:
     """Possible outcomes of a photon-based Bell state measurement (BSM), caused by either
@@ -112,6 +134,16 @@ class TwinDetector(QuantumDetector):
 
     """
 
+    # Measurement operators shared by all detectors, keyed by the setup and detector parameters
+    _meas_operators_cache = {}
+    # Projectors onto m photons arriving at detector A and n at detector B, without a beam splitter
+    _projectors_without_beamsplitter = {
+        (0, 0): np.array([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]),
+        (0, 1): np.array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]),
+        (1, 0): np.array([[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]),
+        (1, 1): np.array([[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1]]),
+    }
+
     def __init__(
         self,
         name: str,
@@ -255,7 +287,20 @@ class TwinDetector(QuantumDetector):
         provided the Hong-Ou-Mandel dip visibility at hand.
         Then we include detection efficiency and dark counts to get a full set of POVMs, after which we find a
         representation in terms of Kraus operators by taking the matrix square root.
+        The operators only depend on the detector parameters, so they are computed once per parameter set and
+        shared between all detectors using the same parameters.
         """
+        cache_key = (
+            "with_beamsplitter",
+            self._p_dark,
+            self._det_eff,
+            self._visibility,
+            self._num_resolving,
+        )
+        meas_operators = TwinDetector._meas_operators_cache.get(cache_key)
+        if meas_operators is not None:
+            self._meas_operators = meas_operators
+            return
         # Start with setting the projective POVMs for a certain number of photons arriving at a detector
         # Assuming mu is real
         mu = np.sqrt(self._visibility)
@@ -344,28 +389,29 @@ class TwinDetector(QuantumDetector):
         # Set the Kraus operator by taking the matrix square root of the POVMs
         if not self.num_resolving:
             # In this case we cannot distinguish between one or two photons getting detected
-            n_00 = ops.Operator("n_0", sqrtm(no_photons_at_both))
+            n_00 = ops.Operator("n_0", _psd_sqrtm(no_photons_at_both))
             n_10 = ops.Operator(
                 "n_10",
-                sqrtm(one_photon_at_A_none_at_B + multiple_photons_at_A_none_at_B),
+                _psd_sqrtm(one_photon_at_A_none_at_B + multiple_photons_at_A_none_at_B),
             )
             n_01 = ops.Operator(
                 "n_01",
-                sqrtm(one_photon_at_B_none_at_A + multiple_photons_at_B_none_at_A),
+                _psd_sqrtm(one_photon_at_B_none_at_A + multiple_photons_at_B_none_at_A),
             )
-            n_11 = ops.Operator("n_11", sqrtm(at_least_one_photon_at_both))
+            n_11 = ops.Operator("n_11", _psd_sqrtm(at_least_one_photon_at_both))
             meas_operators = [n_00, n_10, n_01, n_11]
         else:
             # We have two separate operators for one or two photons arriving at one the detectors, allowing us to
             # identify false positives during entanglement generation
-            n_00 = ops.Operator("n_00", sqrtm(no_photons_at_both))
-            n_10 = ops.Operator("n_10", sqrtm(one_photon_at_A_none_at_B))
-            n_01 = ops.Operator("n_01", sqrtm(one_photon_at_B_none_at_A))
-            n_11 = ops.Operator("n_11", sqrtm(at_least_one_photon_at_both))
-            n_20 = ops.Operator("n_20", sqrtm(multiple_photons_at_A_none_at_B))
-            n_02 = ops.Operator("n_02", sqrtm(multiple_photons_at_B_none_at_A))
+            n_00 = ops.Operator("n_00", _psd_sqrtm(no_photons_at_both))
+            n_10 = ops.Operator("n_10", _psd_sqrtm(one_photon_at_A_none_at_B))
+            n_01 = ops.Operator("n_01", _psd_sqrtm(one_photon_at_B_none_at_A))
+            n_11 = ops.Operator("n_11", _psd_sqrtm(at_least_one_photon_at_both))
+            n_20 = ops.Operator("n_20", _psd_sqrtm(multiple_photons_at_A_none_at_B))
+            n_02 = ops.Operator("n_02", _psd_sqrtm(multiple_photons_at_B_none_at_A))
             meas_operators = [n_00, n_10, n_01, n_11, n_20, n_02]
 
+        TwinDetector._meas_operators_cache[cache_key] = meas_operators
         self._meas_operators = meas_operators
 
     def _set_meas_operators_without_beamsplitter(self):
@@ -375,14 +421,16 @@ class TwinDetector(QuantumDetector):
         If a dark count would occur simultaneously with a single photon, we could measure at most
         two photons, but from this we can still deduce that a single regular photon had arrived.
         Note that since we do not have a beam splitter in this case, there is also no Hong-Ou-Mandel
-        interference visibility involved."""
-        # The projectors without a beam splitter are straight-forward
-        projectors = {
-            (0, 0): np.array([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]),
-            (0, 1): np.array([[0, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]),
-            (1, 0): np.array([[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]),
-            (1, 1): np.array([[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1]]),
-        }
+        interference visibility involved.
+        As with the beam splitter setup, the operators are cached per parameter set and shared between detectors.
+        """
+        cache_key = ("without_beamsplitter", self._p_dark, self._det_eff)
+        meas_operators = TwinDetector._meas_operators_cache.get(cache_key)
+        if meas_operators is not None:
+            self._meas_operators = meas_operators
+            return
+        # The projectors without a beam splitter are straight-forward and do not depend on the parameters
+        projectors = TwinDetector._projectors_without_beamsplitter
         # Initialize POVMs
         no_clicks_at_both = np.zeros([4, 4], dtype=complex)
         click_at_A_none_at_B = np.zeros([4, 4], dtype=complex)
@@ -417,12 +465,14 @@ class TwinDetector(QuantumDetector):
                     (1 - no_click_m) * (1 - no_click_n) * projectors[(m, n)]
                 )
 
-        n_00 = ops.Operator("n_00_no_bs", sqrtm(no_clicks_at_both))
-        n_01 = ops.Operator("n_01_no_bs", sqrtm(click_at_A_none_at_B))
-        n_10 = ops.Operator("n_10_no_bs", sqrtm(click_at_B_none_at_A))
-        n_11 = ops.Operator("n_11_no_bs", sqrtm(click_at_both))
+        n_00 = ops.Operator("n_00_no_bs", _psd_sqrtm(no_clicks_at_both))
+        n_01 = ops.Operator("n_01_no_bs", _psd_sqrtm(click_at_A_none_at_B))
+        n_10 = ops.Operator("n_10_no_bs", _psd_sqrtm(click_at_B_none_at_A))
+        n_11 = ops.Operator("n_11_no_bs", _psd_sqrtm(click_at_both))
 
-        self._meas_operators = [n_00, n_01, n_10, n_11]
+        meas_operators = [n_00, n_01, n_10, n_11]
+        TwinDetector._meas_operators_cache[cache_key] = meas_operators
+        self._meas_operators = meas_operators
 
     def preprocess_inputs(self):
         raise NotImplementedError("Function must be overriden by subclass")
@@ -1,3 +1,4 @@
+import functools
 import logging
 import numpy as np
 
@@ -6,6 +7,44 @@ from netsquid.components.component import Component
 from netsquid.qubits import qubitapi as qapi
 import netsquid.qubits.ketstates as ks
 
+# Target states the fidelity is calculated against, one row per state
+TARGET_STATES = ("|00>", "|11>", "B00", "B01", "B10", "B11")
+_TARGET_KETS = np.vstack(
+    [
+        np.array([1, 0, 0, 0]),
+        np.array([0, 0, 0, 1]),
+        ks.b00.ravel(),
+        ks.b01.ravel(),
+        ks.b10.ravel(),
+        ks.b11.ravel(),
+    ]
+)
+# Initial number of fidelities the result buffer can hold before it is grown
+_INITIAL_CAPACITY = 64
+
+
+def bell_overlaps(qubit0, qubit1):
+    """
+    Calculate the fidelities of the state of two qubits with every target state.
+
+    The state of the qubits is reduced to a density matrix once, after which the
+    expectation value <psi|rho|psi> of every target ket is taken in a single einsum.
+
+    Parameters
+    ----------
+    qubit0 : Qubit
+        The first qubit of the pair.
+    qubit1 : Qubit
+        The second qubit of the pair.
+
+    Returns
+    -------
+    numpy.ndarray
+        The squared fidelities, in the order of ``TARGET_STATES``.
+    """
+    rho = qapi.reduced_dm([qubit0, qubit1])
+    return np.einsum("ij,jk,ik->i", _TARGET_KETS.conj(), rho, _TARGET_KETS).real
+
 
 class FidelityCalculator(Component):
     """
@@ -27,29 +66,48 @@ class FidelityCalculator(Component):
         """
         logging.debug(f"(FidelityCalc | {self.name}) Logging check in __init__")
         super().__init__(name, port_names=["qin0", "qin1", "qout0", "qout1"])
-        self.__fidelity_arr = []
+        self.__fidelity_arr = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self.__fidelity_count = 0
         self.__qubit_slots = {"qin0": None, "qin1": None}
         self.__setup_handlers()
 
     def __setup_handlers(self):
         """Set up handlers for input ports to process incoming qubits."""
-        self.ports["qin0"].bind_input_handler(
-            lambda msg: self.measure_or_store(msg, "qin0")
-        )
-        self.ports["qin1"].bind_input_handler(
-            lambda msg: self.measure_or_store(msg, "qin1")
-        )
+        # Bind the port name once with a partial instead of a closure per port
+        for port_name in ("qin0", "qin1"):
+            self.ports[port_name].bind_input_handler(
+                functools.partial(self.measure_or_store, port=port_name)
+            )
 
     def get_fidelities(self):
         """
-        Retrieve the list of calculated fidelities.
+        Retrieve the calculated fidelities.
 
         Returns
         -------
-        list
-            A list of fidelity values computed by the component.
+        numpy.ndarray
+            A view of the fidelity values computed by the component, in the order they
+            were calculated. Failed calculations are recorded as NaN.
         """
-        return self.__fidelity_arr
+        return self.__fidelity_arr[: self.__fidelity_count]
+
+    def __record_fidelity(self, fidelity):
+        """
+        Append a fidelity to the result buffer, doubling its capacity when it is full.
+
+        Parameters
+        ----------
+        fidelity : float or None
+            The fidelity to record, None if the calculation failed.
+        """
+        if self.__fidelity_count == len(self.__fidelity_arr):
+            grown = np.empty(2 * len(self.__fidelity_arr), dtype=np.float64)
+            grown[: self.__fidelity_count] = self.__fidelity_arr
+            self.__fidelity_arr = grown
+        self.__fidelity_arr[self.__fidelity_count] = (
+            np.nan if fidelity is None else fidelity
+        )
+        self.__fidelity_count += 1
 
     def measure_or_store(self, msg, port):
         """
@@ -85,7 +143,7 @@ class FidelityCalculator(Component):
                 self.__qubit_slots["qin0"], self.__qubit_slots["qin1"]
             )
             logging.debug(f"(FidelityCalc | {self.name}) Fidelity output: {fidelity}")
-            self.__fidelity_arr.append(fidelity)  # Keep track of fidelities
+            self.__record_fidelity(fidelity)  # Keep track of fidelities
             self.return_qubits()
 
     def return_qubits(self):
@@ -130,18 +188,7 @@ class FidelityCalculator(Component):
         Fidelity for the Bell state ``|B00>`` is returned, and all results are logged for debugging.
         """
         try:
-            fidelities = {
-                "|00>": qapi.fidelity(
-                    [qubit0, qubit1], np.array([1, 0, 0, 0]), squared=True
-                ),
-                "|11>": qapi.fidelity(
-                    [qubit0, qubit1], np.array([0, 0, 0, 1]), squared=True
-                ),
-                "B00": qapi.fidelity([qubit0, qubit1], ks.b00, squared=True),
-                "B01": qapi.fidelity([qubit0, qubit1], ks.b01, squared=True),
-                "B10": qapi.fidelity([qubit0, qubit1], ks.b10, squared=True),
-                "B11": qapi.fidelity([qubit0, qubit1], ks.b11, squared=True),
-            }
+            fidelities = dict(zip(TARGET_STATES, bell_overlaps(qubit0, qubit1)))
             logging.debug(f"(FidelityCalc) Fidelities output: {fidelities}")
             return fidelities["B00"]
         except Exception as e:
@@ -1,11 +1,58 @@
-import json
+import functools
 import logging
+from collections import namedtuple
 from detectors import BSMDetector
 from netsquid.components import Component
 from netsquid.components import QuantumChannel
 from netsquid.examples.repeater_chain import FibreDepolarizeModel
 from netsquid.components.models import FibreDelayModel, FibreLossModel
 
+# Loss, depolarization and length parameters of a single switch channel
+ChannelParams = namedtuple(
+    "ChannelParams", "init_loss len_loss init_depolar len_depolar channel_len"
+)
+# Parameters of the short, medium and long channels through the switch
+ModelParams = namedtuple("ModelParams", "short mid long")
+
+# Position of each switch port, used to work out the channel a route goes through
+_PORT_IDX = {
+    "qin0": 0,
+    "qin1": 1,
+    "qin2": 2,
+    "qout0": 0,
+    "qout1": 1,
+    "qout2": 2,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _routing_plan(routing_items):
+    """
+    Resolve a routing table into the outbound port and channel index per inbound port.
+
+    Switches are rebuilt for every simulation run but reconfigured with the same
+    handful of routing tables, so the plan is memoized per table.
+
+    Parameters
+    ----------
+    routing_items : tuple
+        ``(inbound_port, outbound_port)`` pairs of the routing table.
+
+    Returns
+    -------
+    dict
+        Mapping of inbound port to an ``(outbound_port, channel_idx)`` tuple, where
+        the channel index is 0 for the short, 1 for the medium and 2 for the long
+        channel. The returned dict is shared and must not be mutated.
+    """
+    return {
+        inbound_port: (
+            outbound_port,
+            abs(_PORT_IDX[inbound_port] - _PORT_IDX[outbound_port]),
+        )
+        for inbound_port, outbound_port in routing_items
+    }
+
 
 class FSOSwitch(Component):
     """
@@ -19,10 +66,17 @@ class FSOSwitch(Component):
     ----------
     name : str
         Name of the FSO switch.
-    model_parameters : dict
+    model_parameters : ModelParams
         Configuration for fiber loss, delay, and depolarization models.
     """
 
+    # Port names that a routing table must map from and to
+    _QIN_SET = frozenset({"qin0", "qin1", "qin2"})
+    _QOUT_SET = frozenset({"qout0", "qout1", "qout2"})
+
+    # Fibre models shared by all switches, keyed by model type and parameters
+    _FIBRE_MODELS = {}
+
     def __init__(self, name, model_parameters):
         ports = [
             "qin0",
@@ -64,15 +118,24 @@ class FSOSwitch(Component):
         Setup routing for the incoming ports through the lossy channels to the output
         ports
         """
-        # Bind input handlers
-        self.ports["qin0"].bind_input_handler(self.__recv_qubit, tag_meta=True)
-        self.ports["qin1"].bind_input_handler(self.__recv_qubit, tag_meta=True)
-        self.ports["qin2"].bind_input_handler(self.__recv_qubit, tag_meta=True)
+        # Bind input handlers, each one knows its own inbound port so the messages do
+        # not need to be tagged with the receiving port name
+        for port_name in ("qin0", "qin1", "qin2"):
+            self.ports[port_name].bind_input_handler(
+                functools.partial(self.__recv_qubit, inbound_port=port_name)
+            )
 
-        # Bind output handlers
-        self.__channels[0].ports["recv"].bind_output_handler(self.__relay_qubit)
-        self.__channels[1].ports["recv"].bind_output_handler(self.__relay_qubit)
-        self.__channels[2].ports["recv"].bind_output_handler(self.__relay_qubit)
+        # Bind output handlers and keep the send ports of the channels at hand
+        self.__channel_send = []
+        for channel in self.__channels:
+            channel.ports["recv"].bind_output_handler(self.__relay_qubit)
+            self.__channel_send.append(channel.ports["send"])
+
+        # Outbound ports are looked up by name for every relayed qubit
+        self.__out_ports = {
+            port_name: self.ports[port_name]
+            for port_name in ("qout0", "qout1", "qout2")
+        }
 
     def __setup_fibre_channels(self, model_parameters):
         """
@@ -80,66 +143,99 @@ class FSOSwitch(Component):
 
         Parameters
         ----------
-        model_parameters : dict
-            Configuration dictionary for short, mid, and long channels with
+        model_parameters : ModelParams
+            Configuration for the short, mid, and long channels with
             depolarization, loss, and delay parameters.
         """
-        model_map_short = {
-            "delay_model": FibreDelayModel(),
-            "quantum_noise_model": FibreDepolarizeModel(
-                p_depol_init=model_parameters["short"]["init_depolar"],
-                p_depol_length=model_parameters["short"]["len_depolar"],
-            ),
-            "quantum_loss_model": FibreLossModel(
-                p_loss_init=model_parameters["short"]["init_loss"],
-                p_loss_length=model_parameters["short"]["len_loss"],
-                rng=None,
-            ),
-        }
-        model_map_mid = {
-            "quantum_noise_model": FibreDepolarizeModel(
-                p_depol_init=model_parameters["mid"]["init_depolar"],
-                p_depol_length=model_parameters["mid"]["len_depolar"],
-            ),
-            "quantum_loss_model": FibreLossModel(
-                p_loss_init=model_parameters["mid"]["init_loss"],
-                p_loss_length=model_parameters["mid"]["len_loss"],
-                rng=None,
-            ),
-        }
-        model_map_long = {
-            "delay_model": FibreDelayModel(),
-            "quantum_noise_model": FibreDepolarizeModel(
-                p_depol_init=model_parameters["long"]["init_depolar"],
-                p_depol_length=model_parameters["long"]["len_depolar"],
-            ),
-            "quantum_loss_model": FibreLossModel(
-                p_loss_init=model_parameters["long"]["init_loss"],
-                p_loss_length=model_parameters["long"]["len_loss"],
-                rng=None,
-            ),
-        }
+        model_map_short = self.__create_fibre_models(model_parameters.short, delay=True)
+        model_map_mid = self.__create_fibre_models(model_parameters.mid, delay=False)
+        model_map_long = self.__create_fibre_models(model_parameters.long, delay=True)
 
         # Model the three different routes qubits can take through the switch
         qchannel_short = QuantumChannel(
             name="qchannel_short",
             models=model_map_short,
-            length=model_parameters["short"]["channel_len"],
+            length=model_parameters.short.channel_len,
         )
         qchannel_mid = QuantumChannel(
             name="qchannel_mid",
             models=model_map_mid,
-            length=model_parameters["mid"]["channel_len"],
+            length=model_parameters.mid.channel_len,
         )
         qchannel_long = QuantumChannel(
             name="qchannel_long",
             models=model_map_long,
-            length=model_parameters["long"]["channel_len"],
+            length=model_parameters.long.channel_len,
         )
 
         # Add subcomponents
         self.__channels = [qchannel_short, qchannel_mid, qchannel_long]
 
+    @classmethod
+    def __create_fibre_models(cls, channel_parameters, delay):
+        """
+        Build the model map for a single fibre channel.
+
+        The depolarization model is left out when both of its probabilities are 0,
+        since it would otherwise be applied to every qubit without any effect. Fibre
+        models only hold their parameters, so one instance is shared between all
+        channels that use the same parameters.
+
+        Parameters
+        ----------
+        channel_parameters : ChannelParams
+            Depolarization and loss parameters of the channel.
+        delay : bool
+            Whether to add a fibre delay model to the channel.
+
+        Returns
+        -------
+        dict
+            Models to pass to the ``QuantumChannel``.
+        """
+        model_map = {
+            "quantum_loss_model": cls.__shared_model(
+                FibreLossModel,
+                p_loss_init=channel_parameters.init_loss,
+                p_loss_length=channel_parameters.len_loss,
+                rng=None,
+            )
+        }
+        if delay:
+            model_map["delay_model"] = cls.__shared_model(FibreDelayModel)
+        if channel_parameters.init_depolar or channel_parameters.len_depolar:
+            model_map["quantum_noise_model"] = cls.__shared_model(
+                FibreDepolarizeModel,
+                p_depol_init=channel_parameters.init_depolar,
+                p_depol_length=channel_parameters.len_depolar,
+            )
+        return model_map
+
+    @classmethod
+    def __shared_model(cls, model_type, **parameters):
+        """
+        Get the cached fibre model of the given type and parameters, creating it on
+        first use.
+
+        Parameters
+        ----------
+        model_type : type
+            Fibre model class to instantiate.
+        **parameters
+            Keyword arguments passed to the model constructor.
+
+        Returns
+        -------
+        Model
+            Model instance shared by every switch requesting the same parameters.
+        """
+        key = (model_type, *sorted(parameters.items()))
+        model = cls._FIBRE_MODELS.get(key)
+        if model is None:
+            model = model_type(**parameters)
+            cls._FIBRE_MODELS[key] = model
+        return model
+
     def __relay_qubit(self, msg):
         """
         Route an incoming quantum message to the appropriate output port.
@@ -149,19 +245,14 @@ class FSOSwitch(Component):
         msg : object
             Quantum message containing metadata for routing.
         """
-        serialized_headers = msg.meta.get("header", "{}")
-        dict_headers = json.loads(serialized_headers)
-        outbound_port = dict_headers.pop("outport", None)
+        outbound_port = msg.meta.pop("outport")
         # Debug print
         logging.debug(
-            f"(FSOSwitch | {self.name}) Relaying qubit to port: {outbound_port}"
+            "(FSOSwitch | %s) Relaying qubit to port: %s", self.name, outbound_port
         )
+        self.__out_ports[outbound_port].tx_output(msg)
 
-        # Serialize headers before sending (dict is unhashable)
-        msg.meta["header"] = json.dumps(dict_headers)
-        self.ports[outbound_port].tx_output(msg)
-
-    def __recv_qubit(self, msg):
+    def __recv_qubit(self, msg, inbound_port):
         """
         Process an inbound qubit, determine the routing path, and forward it
         through the appropriate lossy channel.
@@ -170,32 +261,24 @@ class FSOSwitch(Component):
         ----------
         msg : object
             Quantum message received on a specific input port.
+        inbound_port : str
+            Name of the input port the message was received on.
         """
-        inbound_port = msg.meta.get("rx_port_name", "missing_port_name")
+        meta = msg.meta
         logging.debug(
-            f"(FSOSwitch | {self.name}) Received {msg} on port {inbound_port}"
+            "(FSOSwitch | %s) Received %s on port %s", self.name, msg, inbound_port
         )
         # TODO extract destination from message metadata and route through the
         # correct channel
-        outbound_port = self.__routing_table[inbound_port]
+        outbound_port, channel_send = self.__routes[inbound_port]
 
-        # Deserialize the JSON headers
-        serialized_headers = msg.meta.get("header", "{}")
-        dict_headers = json.loads(serialized_headers)
-        dict_headers["outport"] = outbound_port
+        # The outbound port travels alongside the qubit in the message metadata, the
+        # request headers set by the sender are passed through untouched
+        meta["outport"] = outbound_port
         logging.debug(
-            f"!!! Incoming port: {inbound_port} | Outbound port: {outbound_port}"
+            "!!! Incoming port: %s | Outbound port: %s", inbound_port, outbound_port
         )
-        # Calculate which channel to route through:
-        # 0 -> Short channel
-        # 1 -> Medium channel
-        # 2 -> Long channel
-        channel_idx = abs(int(inbound_port[-1]) - int(outbound_port[-1]))
-        channel = self.__channels[channel_idx]
-
-        # Serialize the headers before sending
-        msg.meta["header"] = json.dumps(dict_headers)
-        channel.ports["send"].tx_input(msg)
+        channel_send.tx_input(msg)
 
     def switch(self, routing_table):
         """
@@ -212,10 +295,16 @@ class FSOSwitch(Component):
         ValueError
             If the provided routing table has invalid keys or values.
         """
-        valid_keys = list(routing_table.keys()) == ["qin0", "qin1", "qin2"]
-        valid_vals = list(routing_table.values()) == ["qout0", "qout1", "qout2"]
+        valid_keys = routing_table.keys() == self._QIN_SET
+        valid_vals = set(routing_table.values()) == self._QOUT_SET
         if not (valid_keys and valid_vals):
-            logging.error(f"Invalid routing rable: {routing_table}")
+            raise ValueError(f"Invalid routing table: {routing_table}")
 
-        self.__routing_table = routing_table.copy()
+        # Resolve every inbound port to its outbound port and the send port of the
+        # channel it is routed through, so receiving a qubit is a single lookup
+        routing_plan = _routing_plan(tuple(routing_table.items()))
+        self.__routes = {
+            inbound_port: (outbound_port, self.__channel_send[channel_idx])
+            for inbound_port, (outbound_port, channel_idx) in routing_plan.items()
+        }
         # TODO set timeout by which you will switch to the next request
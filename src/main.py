@@ -1,193 +1,323 @@
+import os
 import pickle
 import logging
+import functools
+import itertools
+import contextlib
 import numpy as np
 import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from utils import loss
+from utils import SUMMARY_DTYPE, loss, summarize_batch
+from fso_switch import ChannelParams, ModelParams
 from simulation import batch_run
 from plotting import plot_fidelity, plot_ttf, plot_ttf_3d
 
+# Success count of a grid cell whose job failed, its other fields are NaN
+FAILED_COUNT = -1
 
-# TODO add doc comments
+
+@functools.lru_cache(maxsize=None)
 def configure_parameters(depolar_rate, loss_prob=0):
-    model_parameters = {
-        "short": {
-            "init_loss": loss_prob,  # loss(1.319)
-            "len_loss": 0,  # 0.25,
-            "init_depolar": depolar_rate,
-            "len_depolar": 0,
-            "channel_len": 0,  # 0.005,
-        },
-        "mid": {
-            "init_loss": loss_prob,  # loss(2.12),
-            "len_loss": 0,  # 0.25,
-            "init_depolar": depolar_rate,
-            "len_depolar": 0,
-            "channel_len": 0,  # 0.00587,
-        },
-        "long": {
-            "init_loss": loss_prob,  # loss(2.005)
-            "len_loss": 0,  # 0.25,
-            "init_depolar": depolar_rate,
-            "len_depolar": 0,
-            "channel_len": 0,  # 0.00756,
-        },
-    }
+    """
+    Build the FSO switch channel parameters for a depolarization and loss probability.
+
+    The result is memoized per argument pair and is immutable, so it is safely
+    shared between callers.
+
+    Parameters
+    ----------
+    depolar_rate : float
+        Depolarization probability of every switch channel.
+    loss_prob : float, optional
+        Loss probability of every switch channel, by default 0.
+
+    Returns
+    -------
+    ModelParams
+        Short, mid and long channel parameters, as expected by ``FSOSwitch``.
+    """
+    # Distances and per-length losses are kept as references for the real setup
+    short_channel = ChannelParams(
+        init_loss=loss_prob,  # loss(1.319)
+        len_loss=0,  # 0.25,
+        init_depolar=depolar_rate,
+        len_depolar=0,
+        channel_len=0,  # 0.005,
+    )
+    mid_channel = ChannelParams(
+        init_loss=loss_prob,  # loss(2.12),
+        len_loss=0,  # 0.25,
+        init_depolar=depolar_rate,
+        len_depolar=0,
+        channel_len=0,  # 0.00587,
+    )
+    long_channel = ChannelParams(
+        init_loss=loss_prob,  # loss(2.005)
+        len_loss=0,  # 0.25,
+        init_depolar=depolar_rate,
+        len_depolar=0,
+        channel_len=0,  # 0.00756,
+    )
+    model_parameters = ModelParams(
+        short=short_channel, mid=mid_channel, long=long_channel
+    )
     return model_parameters
 
 
-def worker(
-    model_parameters,
-    qpu_depolar_rate,
-    switch_routing,
-    total_runs,
-    output_queue,
-    job_index,
-):
+def init_worker(log_level):
     """
-    Worker function to run the simulation in a separate process.
-    Logs the start of the process and sends results via output_queue.
+    Initialize a pool worker process once, before it runs any job.
+
+    Workers started with the spawn or forkserver start methods do not inherit the
+    logging configuration of the parent, so the parent's level is applied here.
+
+    Parameters
+    ----------
+    log_level : int
+        Level of the root logger in the parent process.
+    """
+    logging.getLogger().setLevel(log_level)
+
+
+def create_pool(process_count):
+    """
+    Create a pool of simulation workers.
+
+    The simulation modules are imported once per worker when it starts, after which
+    the worker runs jobs until the pool is closed.
+
+    Parameters
+    ----------
+    process_count : int
+        Number of worker processes.
+
+    Returns
+    -------
+    multiprocessing.pool.Pool
+        Pool with every worker initialized by ``init_worker``.
+    """
+    return mp.Pool(
+        process_count,
+        initializer=init_worker,
+        initargs=(logging.getLogger().getEffectiveLevel(),),
+    )
+
+
+def worker(qpu_depolar_rate, switch_routing, total_runs, job):
+    """
+    Worker function to run the simulation batch of a single job in a pool process.
 
     Parameters:
     ----------
-    model_parameters : dict
-        Simulation parameters.
     qpu_depolar_rate : float
         QPU depolarization rate.
+    switch_routing : dict
+        Routing table of the FSO switch.
     total_runs : int
         Number of runs.
-    output_queue : multiprocessing.Queue
-        Queue to store results.
-    job_index : int
-        Index of the job for logging purposes.
+    job : tuple
+        Index of the job, its FSO depolarization rate and loss probability, and the
+        seed for its simulation random state.
+
+    Returns
+    -------
+    tuple
+        Index of the job and the batch summary as returned by ``summarize_batch``,
+        or None if the batch failed.
     """
-    logging.info(f"Starting process {job_index} (PID: {mp.current_process().pid})")
+    job_index, depolar_rate, loss_prob, seed = job
+    # Only the two varying parameters are sent to the worker, the full channel
+    # parameters are built (and memoized) on this side of the pipe
+    model_parameters = configure_parameters(depolar_rate, loss_prob)
+    # Per-job progress is only logged at debug level, the grid runs 1600 jobs
+    logging.debug("Starting job %d (PID: %d)", job_index, mp.current_process().pid)
     try:
         result = batch_run(
-            model_parameters, qpu_depolar_rate, switch_routing, total_runs
+            model_parameters, qpu_depolar_rate, switch_routing, total_runs, seed
         )
-        output_queue.put((job_index, result))
+        # Reduce the runs in the worker, so only the summary of the batch is sent
+        # back to the parent instead of every run
+        batch_summary = summarize_batch(result, total_runs)
     except Exception as e:
-        logging.error(
-            f"Process {job_index} (PID: {mp.current_process().pid}) failed: {e}"
+        logging.error(f"Job {job_index} (PID: {mp.current_process().pid}) failed: {e}")
+        batch_summary = None
+    logging.debug("Job %d (PID: %d) finished.", job_index, mp.current_process().pid)
+    return job_index, batch_summary
+
+
+def print_summary(loss_prob, fso_depolar_rates, summary):
+    """
+    Print the summaries of a depolarization rate sweep as a single table.
+
+    Parameters
+    ----------
+    loss_prob : float
+        Loss probability of the sweep.
+    fso_depolar_rates : list
+        Depolarization rates of the sweep.
+    summary : numpy.ndarray
+        ``SUMMARY_DTYPE`` records, one per depolarization rate. Failed jobs are
+        printed as failed instead of with their values.
+    """
+    rows = [
+        f"{'Run':>4} {'Depolar rate':>14} {'Successful fidelity':>20} "
+        f"{'Total fidelity':>15} {'Successful attempts':>20} "
+        f"{'Success probability':>20}"
+    ]
+    for i, (depolar_rate, batch_summary) in enumerate(zip(fso_depolar_rates, summary)):
+        if batch_summary["success_count"] == FAILED_COUNT:
+            rows.append(f"{i:>4} {depolar_rate:>14.6g} {'failed':>20}")
+            continue
+        rows.append(
+            f"{i:>4} {depolar_rate:>14.6g} {batch_summary['success_fidelity']:>20.6g} "
+            f"{batch_summary['total_fidelity']:>15.6g} "
+            f"{batch_summary['success_count']:>20} "
+            f"{batch_summary['success_prob']:>20.6g}"
         )
-        output_queue.put((job_index, None))
-    finally:
-        logging.info(f"Process {job_index} (PID: {mp.current_process().pid}) finished.")
+    print(f"Loss: {loss_prob}\n" + "\n".join(rows))
 
 
-def run_simulation(
+def run_grid(
     total_runs,
     switch_routing,
     fso_depolar_rates,
+    loss_probabilities,
     qpu_depolar_rate=0,
     process_count=4,
-    loss_prob=0,
+    seed=None,
+    pool=None,
 ):
     """
-    Run simulations for given depolarization rates using multiple processes.
+    Run simulations for every combination of loss probability and depolarization
+    rate using multiple processes.
+
+    The whole grid is submitted as one flat set of jobs, so the workers stay busy
+    until the last cell instead of idling at the end of every loss probability.
 
     Parameters
     ----------
     total_runs : int
-        Number of runs per depolarization rate.
+        Number of runs per grid cell.
+    switch_routing : dict
+        Routing table of the FSO switch.
     fso_depolar_rates : list
         List of depolarization rates.
+    loss_probabilities : list
+        List of loss probabilities.
     qpu_depolar_rate : float
         Depolarization rate for QPU.
     process_count : int
-        Number of concurrent processes.
+        Number of concurrent processes, sizes the pool created when none is given
+        and the chunks of jobs handed to the workers.
+    seed : int, optional
+        Entropy for the per-job seeds, by default fresh entropy is drawn.
+    pool : multiprocessing.pool.Pool, optional
+        Worker pool to run the jobs on, by default a pool is created for this call.
+        Passing a pool lets consecutive calls reuse the same worker processes.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``SUMMARY_DTYPE`` records of shape ``(len(loss_probabilities),
+        len(fso_depolar_rates))``. The floating point fields of failed jobs are NaN
+        and their success count is ``FAILED_COUNT``.
     """
-    model_parameters_list = [
-        configure_parameters(rate, loss_prob) for rate in fso_depolar_rates
+    grid_shape = (len(loss_probabilities), len(fso_depolar_rates))
+    job_count = grid_shape[0] * grid_shape[1]
+
+    # Forked workers inherit the same random state, give every job its own seed so
+    # the batches are statistically independent
+    job_seeds = [
+        int(child.generate_state(1)[0])
+        for child in np.random.SeedSequence(seed).spawn(job_count)
     ]
+    grid_cells = itertools.product(loss_probabilities, fso_depolar_rates)
+    jobs = (
+        (job_index, float(rate), float(loss_prob), job_seed)
+        for job_index, ((loss_prob, rate), job_seed) in enumerate(
+            zip(grid_cells, job_seeds)
+        )
+    )
 
-    # Initialize process management
-    active_processes = []
-    output_queue = mp.Queue()
-    results = [None] * len(model_parameters_list)  # To store results in order
-    next_job_index = 0  # Index of the next job to be started
-
-    # Process scheduling loop
-    while next_job_index < len(model_parameters_list) or active_processes:
-        # Start new processes if the pool isn't full
-        while len(active_processes) < process_count and next_job_index < len(
-            model_parameters_list
+    # The pool workers are forked once and pick up jobs as they become free, the
+    # batch summaries arrive in completion order and are stored by job index. Failed
+    # jobs are logged by the worker and keep NaN in their floating point fields and
+    # FAILED_COUNT as success count, so they cannot be mistaken for cells without
+    # any successful run
+    summary = np.zeros(job_count, dtype=SUMMARY_DTYPE)
+    for field in SUMMARY_DTYPE.names:
+        if SUMMARY_DTYPE[field].kind == "f":
+            summary[field] = np.nan
+    summary["success_count"] = FAILED_COUNT
+    failed_count = 0
+    job_worker = functools.partial(worker, qpu_depolar_rate, switch_routing, total_runs)
+    pool_context = (
+        create_pool(process_count) if pool is None else contextlib.nullcontext(pool)
+    )
+    # Hand out jobs in chunks to cut the per-job IPC round trips, while keeping
+    # around four chunks per worker so the load stays balanced
+    chunksize = max(1, job_count // (4 * process_count))
+    with pool_context as job_pool:
+        for job_index, batch_summary in job_pool.imap_unordered(
+            job_worker, jobs, chunksize=chunksize
         ):
-            process = mp.Process(
-                target=worker,
-                args=(
-                    model_parameters_list[next_job_index],
-                    qpu_depolar_rate,
-                    switch_routing,
-                    total_runs,
-                    output_queue,
-                    next_job_index,
-                ),
-            )
-            process.start()
-            active_processes.append((process, next_job_index))
-            logging.debug(f"Scheduled process {next_job_index} (PID: {process.pid}).")
-            next_job_index += 1
-
-        # Check for completed processes
-        for process, job_index in active_processes:
-            if not process.is_alive():
-                process.join()
-                logging.debug(f"Process {job_index} (PID: {process.pid}) terminated.")
-                active_processes.remove((process, job_index))
-
-        # Collect results
-        while not output_queue.empty():
-            job_index, result = output_queue.get()
-            results[job_index] = result  # Store result in the correct order
+            if batch_summary is None:
+                failed_count += 1
+            else:
+                summary[job_index] = batch_summary
 
+    if failed_count:
+        logging.warning(
+            "%d of %d jobs failed, their grid cells are NaN", failed_count, job_count
+        )
     logging.info("All processes completed.")
+    return summary.reshape(grid_shape)
 
-    # Results formatting
-    total_fidelities = []
-    success_fidelities = []
-    success_attempts = []
-    success_probabilities = []
-    simulation_times = []
-
-    for i, result in enumerate(results):
-        success_run_fidelities = [
-            fidelity for status, fidelity, _simtime in result if status
-        ]
-        # Calculate the average time for a simulation (successful or not)
-        simulation_times.append(np.average([t for _, _, t in result]))
-
-        success_count = len(success_run_fidelities)
-        success_fidelity_avg = (
-            np.average(success_run_fidelities) if success_count > 0 else 0
-        )
-        success_fidelities.append(success_fidelity_avg)
-
-        success_attempts.append(success_count)
-        total_fidelity_avg = np.average([fidelity for _, fidelity, _simtime in result])
-        total_fidelities.append(total_fidelity_avg)
-        success_prob = success_count / total_runs
-        success_probabilities.append(success_prob)
-        print(
-            """Run: {i}, loss: {loss_prob}
-        Depolar rate: {depolar_rate}
-        Successful fidelity: {success_fidelity_avg}
-        Total fidelity: {total_fidelity_avg}
-        Successful attempts: {success_count}
-        Success probability: {success_prob}
-        """.format(
-                i=i,
-                loss_prob=loss_prob,
-                depolar_rate=fso_depolar_rates[i],
-                success_fidelity_avg=success_fidelity_avg,
-                total_fidelity_avg=total_fidelity_avg,
-                success_count=success_count,
-                success_prob=success_prob,
-            )
-        )
 
-    return success_fidelities, success_probabilities, simulation_times
+def run_simulation(
+    total_runs,
+    switch_routing,
+    fso_depolar_rates,
+    qpu_depolar_rate=0,
+    process_count=4,
+    loss_prob=0,
+    seed=None,
+    pool=None,
+):
+    """
+    Run simulations for given depolarization rates using multiple processes.
+
+    Parameters
+    ----------
+    total_runs : int
+        Number of runs per depolarization rate.
+    fso_depolar_rates : list
+        List of depolarization rates.
+    qpu_depolar_rate : float
+        Depolarization rate for QPU.
+    process_count : int
+        Number of concurrent processes, sizes the pool created when none is given
+        and the chunks of jobs handed to the workers.
+    seed : int, optional
+        Entropy for the per-job seeds, by default fresh entropy is drawn.
+    pool : multiprocessing.pool.Pool, optional
+        Worker pool to run the jobs on, by default a pool is created for this call.
+        Passing a pool lets consecutive calls reuse the same worker processes.
+    """
+    summary = run_grid(
+        total_runs,
+        switch_routing,
+        fso_depolar_rates,
+        [loss_prob],
+        qpu_depolar_rate=qpu_depolar_rate,
+        process_count=process_count,
+        seed=seed,
+        pool=pool,
+    )[0]
+    print_summary(loss_prob, fso_depolar_rates, summary)
+
+    return summary["success_fidelity"], summary["success_prob"], summary["sim_time"]
     # Plot the distilled fidelity results
     # plot_fidelity(success_fidelities, fso_depolar_rates)
 
@@ -197,86 +327,70 @@ def main():
     # Set logging level
     logging.getLogger().setLevel(logging.INFO)
 
-    # Set switch routing configuration
-    # All possible routing configurations, Alice and Bob bindings
-    # and route lengths for the 3x3
-    # 0: 2, 1: 1, 2: 0 (A: 1, B: 2) 1 1
-    # 0: 2, 1: 0, 2: 1 (A: 1, B: 2) 0 2
-    # 0: 0, 1: 2, 2: 1 (A: 0, B: 2) 0 1
-    # 0: 1, 1: 2, 2: 0 (A: 0, B: 2) 1 2
-    # 0: 0, 1: 1, 2: 2 (A: 0, B: 1) 0 0
-    # 0: 2, 1: 1, 2: 2 (A: 0, B: 2) 2 2
-    _switch_routings = [
-        (
-            {"qin0": "qout2", "qin1": "qout1", "qin2": "qout0"},
-            {"Alice": "qin1", "Bob": "qin2"},
-        ),
-        (
-            {"qin0": "qout2", "qin1": "qout0", "qin2": "qout1"},
-            {"Alice": "qin1", "Bob": "qin2"},
-        ),
-        (
-            {"qin0": "qout0", "qin1": "qout2", "qin2": "qout1"},
-            {"Alice": "qin0", "Bob": "qin2"},
-        ),
-        (
-            {"qin0": "qout1", "qin1": "qout2", "qin2": "qout0"},
-            {"Alice": "qin0", "Bob": "qin2"},
-        ),
-        (
-            {"qin0": "qout0", "qin1": "qout1", "qin2": "qout2"},
-            {"Alice": "qin0", "Bob": "qin1"},
-        ),
-        (
-            {"qin0": "qout2", "qin1": "qout1", "qin2": "qout2"},
-            {"Alice": "qin0", "Bob": "qin2"},
-        ),
-    ]
+    # Create the output directories up front, so a long sweep does not fail when
+    # saving its results
+    for output_dir in ("plots/3d", "plots/heatmaps", "plots/2d", "plotdata"):
+        os.makedirs(output_dir, exist_ok=True)
+
     switch_routing = {"qin0": "qout0", "qin1": "qout1", "qin2": "qout2"}
 
     fso_depolar_rates = np.linspace(0, 0.5, 40)
     loss_probabilities = np.linspace(0, 1, 40)
+    # The sweep axes are shared with the workers and key the plot data, freeze them
+    fso_depolar_rates.setflags(write=False)
+    loss_probabilities.setflags(write=False)
     qpu_depolar_rate = 0
     total_runs = 18000
     process_count = 20
+    # Run the whole (loss probability, depolarization rate) grid as one set of jobs
+    grid_summary = run_grid(
+        total_runs=total_runs,
+        switch_routing=switch_routing,
+        fso_depolar_rates=fso_depolar_rates,
+        loss_probabilities=loss_probabilities,
+        qpu_depolar_rate=qpu_depolar_rate,
+        process_count=process_count,
+    )
     plot_data = {}
-    for loss_prob in loss_probabilities:
-        success_fidelities, success_probabilities, simulation_times = run_simulation(
-            total_runs=total_runs,
-            switch_routing=switch_routing,
-            fso_depolar_rates=fso_depolar_rates,
-            qpu_depolar_rate=qpu_depolar_rate,
-            process_count=process_count,
-            loss_prob=loss_prob,
-        )
+    for loss_prob, summary in zip(loss_probabilities, grid_summary):
+        print_summary(loss_prob, fso_depolar_rates, summary)
         plot_data[loss_prob] = (
-            success_fidelities,
-            success_probabilities,
-            simulation_times,
+            summary["success_fidelity"],
+            summary["success_prob"],
+            summary["sim_time"],
         )
     print(plot_data)
 
     thresholds = [0.9995, 0.995, 0.95, 0.9, 0.8, 0.7]
-    for threshold in thresholds:
-        plot_ttf(
-            fso_depolar_rates,
-            loss_probabilities,
-            plot_data,
-            threshold=threshold,
-        )
-        plot_ttf_3d(
-            fso_depolar_rates,
-            loss_probabilities,
-            plot_data,
-            threshold=threshold,
+    # Every plot is independent, render and encode them in parallel processes
+    with ProcessPoolExecutor(max_workers=process_count) as executor:
+        plot_jobs = []
+        for threshold in thresholds:
+            for plot_function in (plot_ttf, plot_ttf_3d):
+                plot_jobs.append(
+                    executor.submit(
+                        plot_function,
+                        fso_depolar_rates,
+                        loss_probabilities,
+                        plot_data,
+                        threshold=threshold,
+                    )
+                )
+        plot_jobs.append(
+            executor.submit(plot_fidelity, plot_data[0][0], fso_depolar_rates)
         )
-    plot_fidelity(plot_data[0][0], fso_depolar_rates)
 
-    # Save data to file
-    with open("plotdata/data_file.pkl", "wb") as file:
-        pickle.dump(
-            (fso_depolar_rates, loss_probabilities, thresholds, plot_data), file
-        )
+        # Save data to file while the plots are being rendered
+        with open("plotdata/data_file.pkl", "wb") as file:
+            pickle.dump(
+                (fso_depolar_rates, loss_probabilities, thresholds, plot_data),
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        # Surface any exception raised while plotting
+        for plot_job in as_completed(plot_jobs):
+            plot_job.result()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,19 @@
-class MessageHeader():
-    def __init__(self, id, output_q, output_c):
-        self.id = id
-        self.output_q = output_q
-        self.output_c = output_c
+from dataclasses import dataclass
+from typing import Optional, Union
 
+
+@dataclass(frozen=True)
+class MessageHeader:
+    """
+    Header attached to the metadata of messages sent by a QPU entity.
+
+    Parameters
+    ----------
+    request_id : int or str
+        The ID of the request the message belongs to.
+    event_id : int, optional
+        ID of the event that put the message on the port, by default None.
+    """
+
+    request_id: Union[int, str]
+    event_id: Optional[int] = None
@@ -1,14 +1,75 @@
-import json
+import functools
 import logging
 import netsquid as ns
 
 from collections import deque
+from networking import MessageHeader
 from netsquid.components.component import Message
 from netsquid.components.qprocessor import QuantumProcessor
 from qpu_programs import EmitProgram, CorrectYProgram, CorrectXProgram
 
 import netsquid.qubits.qubitapi as qapi
 
+# Instructions supported by every QPU, built once and shared between processors
+_PHYSICAL_INSTRUCTIONS = (
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_INIT, duration=3, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_H, duration=1, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_X, duration=1, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_Y, duration=1, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_Z, duration=1, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_CNOT,
+        duration=4,
+        parallel=True,
+        topology=[(0, 1)],
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_EMIT, duration=1, parallel=True
+    ),
+    ns.components.qprocessor.PhysicalInstruction(
+        ns.components.instructions.INSTR_MEASURE, duration=7, parallel=False
+    ),
+)
+
+# Correction gate and program per BSM Bell index that takes the ebit to |00> + |11>:
+# 1 is the |01> + |10> state and needs an X correction, 2 is the |01> - |10> state
+# and needs a Y correction
+_CORRECTIONS = {
+    1: ("X", CorrectXProgram),
+    2: ("Y", CorrectYProgram),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_noise_model(depolar_rate):
+    """
+    Get the depolarizing memory noise model for a given rate.
+
+    Every run builds new QPUs with the same handful of rates, so the model is memoized
+    per rate and shared between processors.
+
+    Parameters
+    ----------
+    depolar_rate : float
+        Depolarization rate of the memory, must be positive.
+
+    Returns
+    -------
+    DepolarNoiseModel
+        The shared noise model for the rate.
+    """
+    return ns.components.models.DepolarNoiseModel(depolar_rate=depolar_rate)
+
 
 class QPUEntity(ns.pydynaa.Entity):
     """
@@ -62,44 +123,25 @@ class QPUEntity(ns.pydynaa.Entity):
         -------
         QuantumProcessor
             A configured quantum processor with specified characteristics.
+
+        Raises
+        ------
+        ValueError
+            If the depolarization rate is negative.
         """
-        physical_instructions = [
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_INIT, duration=3, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_H, duration=1, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_X, duration=1, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_Y, duration=1, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_Z, duration=1, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_CNOT,
-                duration=4,
-                parallel=True,
-                topology=[(0, 1)],
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_EMIT, duration=1, parallel=True
-            ),
-            ns.components.qprocessor.PhysicalInstruction(
-                ns.components.instructions.INSTR_MEASURE, duration=7, parallel=False
-            ),
-        ]
-        memory_noise_model = ns.components.models.DepolarNoiseModel(
-            depolar_rate=depolar_rate
-        )
+        if depolar_rate < 0:
+            raise ValueError(f"Invalid depolarization rate: {depolar_rate}")
+
+        # A zero depolarization rate leaves the memory noiseless, skip the model so it
+        # is not evaluated every time a qubit is accessed
+        memory_noise_models = None
+        if depolar_rate != 0:
+            memory_noise_models = [_memory_noise_model(depolar_rate)] * qbit_count
         processor = QuantumProcessor(
             name,
             num_positions=qbit_count,
-            memory_noise_models=[memory_noise_model] * qbit_count,
-            phys_instructions=physical_instructions,
+            memory_noise_models=memory_noise_models,
+            phys_instructions=list(_PHYSICAL_INSTRUCTIONS),
         )
         processor.add_ports(["correction", "qout_hdr", "qout0_hdr"])
         return processor
@@ -131,36 +173,36 @@ class QPUEntity(ns.pydynaa.Entity):
         Returns
         -------
         None
-            Modifies the message in place by adding a JSON-serialized header.
+            Modifies the message in place by adding a ``MessageHeader``.
         """
         port = msg.meta.get("rx_port_name", "missing_port_metadata")
         event_id = msg.meta["put_event"].id
         request_id = self.__request_id
 
-        header = {"event_id": event_id, "request_id": request_id}
-        msg.meta["header"] = json.dumps(header)
+        msg.meta["header"] = MessageHeader(request_id, event_id)
         self.processor.ports[f"{port}_hdr"].tx_output(msg)
 
     # Callback for when a QPU program finishes executing successfully
     def __on_program_done(self):
         """Handle completion of a program, and process the next one if queued."""
-        logging.debug(f"(QPUEntity | {self.name}) program complete")
-        if len(self.__queue) > 0 and not self.processor.busy:
+        logging.debug("(QPUEntity | %s) program complete", self.name)
+        if self.__queue and not self.processor.busy:
             if self.processor.peek(0, skip_noise=True)[0] is not None:
                 next_program = self.__queue.popleft()
                 logging.debug(
-                    f"(QPUEntity | {self.name}) queuing next program: {next_program}"
+                    "(QPUEntity | %s) queuing next program: %s", self.name, next_program
                 )
                 self.add_program(next_program)
 
     # Callback for when a QPU program exits with a failure
     def __on_program_fail(self):
         """Callback that's run on QPU program failure."""
-        logging.debug(f"(QPUEntity | {self.name}) program resulted in a failure.")
-        if len(self.__queue) > 0:
-            (next_program, request_id) = self.__queue.popleft()
+        logging.debug("(QPUEntity | %s) program resulted in a failure.", self.name)
+        if self.__queue:
+            # The queue only holds programs, see add_program
+            next_program = self.__queue.popleft()
             logging.debug(
-                f"(QPUEntity | {self.name}) queuing next program: {next_program} with request ID: {request_id}"
+                "(QPUEntity | %s) queuing next program: %s", self.name, next_program
             )
             self.add_program(next_program)
 
@@ -176,25 +218,24 @@ class QPUEntity(ns.pydynaa.Entity):
         msg : Message
             The message containing BSM results for corrections.
         """
-        bell_idx = msg.items[0].bell_index
-        self.__status = msg.items[0].success
+        outcome = msg.items[0]
+        bell_idx = outcome.bell_index
+        self.__status = outcome.success
         if self.__correction:
             logging.debug(
-                f"(QPUEntity | {self.name}) Fidelities output: Bell Index: {bell_idx}"
+                "(QPUEntity | %s) Fidelities output: Bell Index: %s",
+                self.name,
+                bell_idx,
             )
 
-        if bell_idx == 1 and self.__correction:
-            # This means the state is in state |01> + |10> and needs X correction to
-            # become |00> + |11>
-            logging.debug(f"(QPUEntity | {self.name}) Performing X correction")
-            self.add_program(CorrectXProgram())
-        elif bell_idx == 2 and self.__correction:
-            # This means the state is in state |01> - |10> and needs X correction to
-            # become |00> + |11>
-            logging.debug(f"(QPUEntity | {self.name}) Performing Y correction")
-            self.add_program(CorrectYProgram())
-        else:
-            logging.debug(f"(QPUEntity | {self.name}) No correction needed")
+        correction = _CORRECTIONS.get(bell_idx) if self.__correction else None
+        if correction is None:
+            logging.debug("(QPUEntity | %s) No correction needed", self.name)
+            return
+
+        gate, program_type = correction
+        logging.debug("(QPUEntity | %s) Performing %s correction", self.name, gate)
+        self.add_program(program_type())
 
     # ======== PUBLIC METHODS ========
     # Register a current request ID to send over to the FSO switch
@@ -219,21 +260,27 @@ class QPUEntity(ns.pydynaa.Entity):
         program : QuantumProgram
             The quantum program to be added to the QPU's queue.
         """
-        logging.debug(f"(QPUEntity | {self.name}) Call to add_program with {program}")
+        logging.debug(
+            "(QPUEntity | %s) Call to add_program with %s", self.name, program
+        )
         if not self.processor.busy:
             if not self.__measuring:
-                logging.debug(f"(QPUEntity | {self.name}) executing program {program}")
+                logging.debug(
+                    "(QPUEntity | %s) executing program %s", self.name, program
+                )
                 _event = self.processor.execute_program(program)  # TODO handle event
                 # TODO handle this event somehow
                 # event.wait(callback=lambda: logging.debug(f"Program done callback"))
             else:
                 logging.debug(
-                    f"(QPUEntity | {self.name}) appending program to queue (measuring qubit fidelity)"
+                    "(QPUEntity | %s) appending program to queue (measuring qubit "
+                    "fidelity)",
+                    self.name,
                 )
                 self.__queue.append(program)
         else:
             logging.debug(
-                f"(QPUEntity | {self.name}) appending program to queue (QPU busy)"
+                "(QPUEntity | %s) appending program to queue (QPU busy)", self.name
             )
             self.__queue.append(program)
 
@@ -265,14 +312,14 @@ class QPUEntity(ns.pydynaa.Entity):
         position : int, optional
             The memory position of the qubit to emit, by default 0.
         """
-        header = {"request_id": request_id}
+        header = MessageHeader(request_id)
         qubit = self.processor.peek(position, skip_noise=True)[0]
         state = qubit.qstate.qrepr
-        print(f"State: {state}")
+        logging.debug("(QPUEntity | %s) State: %s", self.name, state)
         clone = qapi.create_qubits(1, no_state=True)[0]
         qapi.assign_qstate(clone, state)
         msg = Message(qubit)
-        msg.meta["header"] = json.dumps(header)
+        msg.meta["header"] = header
         self.ports["fidelity_out"].tx_output(msg)
 
     def emit(self, position=0):
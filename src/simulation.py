@@ -1,11 +1,13 @@
 import logging
 import numpy as np
 import netsquid as ns
-import netsquid.qubits.ketstates as ks
-import netsquid.qubits.qubitapi as qapi
 
 from qpu_entity import QPUEntity
 from fso_switch import FSOSwitch
+from fidelity_calculator import TARGET_STATES, bell_overlaps
+
+# Position of the returned B00 fidelity in the output of bell_overlaps
+_B00_INDEX = TARGET_STATES.index("B00")
 
 
 # Get two qubits at positions 0 for alice and bob and calculate their fidelities
@@ -28,25 +30,21 @@ def get_fidelities(alice, bob):
         - fidelity (float): Fidelity of the Bell state |B00>.
     """
     status = alice.get_status() and bob.get_status()
-    qubit0 = alice.get_qubit(0)
-    qubit1 = bob.get_qubit(0)
-    fidelities = {
-        "|00>": qapi.fidelity([qubit0, qubit1], np.array([1, 0, 0, 0]), squared=True),
-        "|11>": qapi.fidelity([qubit0, qubit1], np.array([0, 0, 0, 1]), squared=True),
-        "B00": qapi.fidelity([qubit0, qubit1], ks.b00, squared=True),
-        "B01": qapi.fidelity([qubit0, qubit1], ks.b01, squared=True),
-        "B10": qapi.fidelity([qubit0, qubit1], ks.b10, squared=True),
-        "B11": qapi.fidelity([qubit0, qubit1], ks.b11, squared=True),
-    }
+    fidelities = bell_overlaps(alice.get_qubit(0), bob.get_qubit(0))
 
-    if status:
-        logging.debug(f"[GREPPABLE] Simulation output: {fidelities}")
+    # The fidelities are only labelled for the log when it is actually emitted
+    if status and logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(
+            "[GREPPABLE] Simulation output: %s", dict(zip(TARGET_STATES, fidelities))
+        )
 
-    return status, fidelities["B00"]
+    return status, fidelities[_B00_INDEX]
 
 
 # Runs the simulation several times, determined by the batch size.
-def batch_run(model_parameters, qpu_depolar_rate, switch_routing, batch_size):
+def batch_run(
+    model_parameters, qpu_depolar_rate, switch_routing, batch_size, seed=None
+):
     """
     Run multiple quantum simulations with specified configurations and collect results.
 
@@ -60,21 +58,28 @@ def batch_run(model_parameters, qpu_depolar_rate, switch_routing, batch_size):
         Routing table for the FSO switch.
     batch_size : int
         Number of simulation runs in the batch.
+    seed : int, optional
+        Seed for NetSquid's random state, set before the first run. By default the
+        random state is left as is.
 
     Returns
     -------
-    list[tuple]
-        A list of tuples containing the simulation status and fidelity for each run.
+    numpy.ndarray
+        A ``(batch_size, 3)`` array with the simulation status, fidelity and
+        simulation time of each run.
     """
-    results = []
-    for _ in range(batch_size):
+    if seed is not None:
+        ns.set_random_state(seed=seed)
+
+    # The runs are written into one contiguous buffer rather than a list of tuples
+    results = np.empty((batch_size, 3), dtype=np.float64)
+    for run_index in range(batch_size):
         # Reset the simulation to avoid state carryover between runs.
         ns.sim_reset()
 
         # Initialize QPU entities with their respective depolarization rates and correction settings.
         alice = QPUEntity("AliceQPU", correction=False, depolar_rate=qpu_depolar_rate)
         bob = QPUEntity("BobQPU", correction=True, depolar_rate=qpu_depolar_rate)
-        _charlie = QPUEntity("CharlieQPU", correction=True)
 
         # Create and configure the FSO switch for routing quantum information.
         fsoswitch = FSOSwitch("bsm_fsoswitch", model_parameters)
@@ -99,11 +104,11 @@ def batch_run(model_parameters, qpu_depolar_rate, switch_routing, batch_size):
 
         # Run the simulation and log the process.
         logging.debug("Starting simulation")
-        stats = ns.sim_run()
+        ns.sim_run()
         simtime = ns.sim_time()
 
         # Extract and log simulation results for debugging purposes.
         status, fidelity = get_fidelities(alice, bob)
-        results.append((status, fidelity, simtime))
+        results[run_index] = (status, fidelity, simtime)
 
     return results
@@ -1,35 +1,60 @@
 import numpy as np
 from scipy.optimize import fsolve
 
+# Summary of a simulation batch, one record per depolarization rate
+SUMMARY_DTYPE = np.dtype(
+    [
+        ("success_fidelity", np.float64),
+        ("total_fidelity", np.float64),
+        ("success_count", np.int64),
+        ("success_prob", np.float64),
+        ("sim_time", np.float64),
+    ]
+)
+
 
 # Function to calculate fidelity after entanglement distillation
 def distilled_fidelity(fidelity, n):
     """
     Calculate the upper bound of fidelity after entanglement distillation.
 
+    Accepts scalars as well as numpy arrays, which are broadcast against each other
+    so the fidelities for several qubit counts can be evaluated in one call.
+
     Parameters
     ----------
-    fidelity : float
+    fidelity : float or array_like
         Initial fidelity of a single qubit.
-    n : int
+    n : int or array_like
         Number of qubits used for entanglement distillation.
 
     Returns
     -------
-    float
+    float or numpy.ndarray
         Fidelity after entanglement distillation.
     """
-    if n == 1:
-        return fidelity
+    if np.ndim(fidelity) == 0 and np.ndim(n) == 0:
+        if n == 1:
+            return fidelity
 
-    numerator = pow(fidelity, n)
-    denominator = numerator + pow(1 - fidelity, n)
+        numerator = pow(fidelity, n)
+        denominator = numerator + pow(1 - fidelity, n)
 
-    # Avoid division by zero
-    if denominator == 0:
-        return 0.0
+        # Avoid division by zero
+        if denominator == 0:
+            return 0.0
 
-    return numerator / denominator
+        return numerator / denominator
+
+    fidelity = np.asarray(fidelity, dtype=np.float64)
+    n = np.asarray(n)
+    numerator = np.power(fidelity, n)
+    denominator = numerator + np.power(1 - fidelity, n)
+
+    # Avoid division by zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distilled = np.where(denominator == 0, 0.0, numerator / denominator)
+    return np.where(n == 1, fidelity, distilled)
 
 
 def find_minimum_ebits(fidelity, target_fidelity):
@@ -113,3 +138,36 @@ def loss(decibels):
 # Calculate the time (in nanoseconds) needed to get the distillation ebits
 def time_to_fidelity(success_probability, time_to_ebit, distillation_ebits):
     return (distillation_ebits * time_to_ebit) / success_probability
+
+
+def summarize_batch(result, total_runs):
+    """
+    Reduce the per-run results of a simulation batch to its summary statistics.
+
+    Parameters
+    ----------
+    result : numpy.ndarray or list[tuple]
+        ``(status, fidelity, simtime)`` rows as returned by ``batch_run``.
+    total_runs : int
+        Number of runs the success probability is calculated against.
+
+    Returns
+    -------
+    tuple
+        Success fidelity, total fidelity, success count, success probability and
+        average simulation time, in the field order of ``SUMMARY_DTYPE``.
+    """
+    # Reduce the runs with numpy masks instead of looping over them in Python
+    runs = np.asarray(result, dtype=np.float64).reshape(-1, 3)
+    success_mask = runs[:, 0].astype(bool)
+    fidelities = runs[:, 1]
+
+    success_count = int(np.count_nonzero(success_mask))
+    success_fidelity_avg = fidelities[success_mask].mean() if success_count > 0 else 0
+    return (
+        success_fidelity_avg,
+        fidelities.mean(),
+        success_count,
+        success_count / total_runs,
+        runs[:, 2].mean(),
+    )
@@ -0,0 +1,40 @@
+import pytest
+
+from src.fso_switch import ChannelParams, FSOSwitch, ModelParams
+
+
+@pytest.fixture
+def fso_switch():
+    """Fixture to create an FSOSwitch with lossless, noiseless channels."""
+    channel = ChannelParams(
+        init_loss=0, len_loss=0, init_depolar=0, len_depolar=0, channel_len=0
+    )
+    model_parameters = ModelParams(short=channel, mid=channel, long=channel)
+    return FSOSwitch("TestSwitch", model_parameters)
+
+
+def test_switch_accepts_permutation(fso_switch):
+    """Test that a routing table mapping the inputs to distinct outputs is accepted."""
+    routing_table = {"qin0": "qout2", "qin1": "qout0", "qin2": "qout1"}
+
+    fso_switch.switch(routing_table)
+
+    routes = fso_switch._FSOSwitch__routes
+    assert {port: route[0] for port, route in routes.items()} == routing_table
+
+
+@pytest.mark.parametrize(
+    "routing_table",
+    [
+        # Two inputs routed to the same output
+        {"qin0": "qout2", "qin1": "qout1", "qin2": "qout2"},
+        # Missing input port
+        {"qin0": "qout0", "qin1": "qout1"},
+        # Unknown output port
+        {"qin0": "qout0", "qin1": "qout1", "qin2": "qout3"},
+    ],
+)
+def test_switch_rejects_invalid_table(fso_switch, routing_table):
+    """Test that an invalid routing table raises a ValueError."""
+    with pytest.raises(ValueError):
+        fso_switch.switch(routing_table)
@@ -0,0 +1,41 @@
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from src import main
+
+
+def test_run_grid_failed_jobs_are_nan(monkeypatch):
+    """Test that failed jobs leave NaN cells in the grid instead of zeroed ones."""
+
+    def batch_run(model_parameters, qpu_depolar_rate, switch_routing, batch_size, seed):
+        if model_parameters.short.init_depolar > 0:
+            raise RuntimeError("simulation failed")
+        return np.array([[1, 0.9, 2.0], [0, 0.5, 4.0]])
+
+    monkeypatch.setattr(main, "batch_run", batch_run)
+    # A thread pool runs the jobs in this process, where batch_run is patched
+    with ThreadPool(2) as pool:
+        summary = main.run_grid(2, {}, [0.0, 0.2], [0.0], pool=pool)
+
+    assert summary.shape == (1, 2)
+    succeeded, failed = summary[0]
+    assert succeeded["success_fidelity"] == 0.9
+    assert succeeded["success_prob"] == 0.5
+    assert succeeded["success_count"] == 1
+    for field in ("success_fidelity", "total_fidelity", "success_prob", "sim_time"):
+        assert np.isnan(failed[field])
+    assert failed["success_count"] == main.FAILED_COUNT
+
+
+def test_print_summary_marks_failed_jobs(capsys):
+    """Test that failed cells are printed as failed rather than as zero successes."""
+    summary = np.zeros(2, dtype=main.SUMMARY_DTYPE)
+    summary[0] = (0.9, 0.7, 1, 0.5, 3.0)
+    summary[1] = (np.nan, np.nan, main.FAILED_COUNT, np.nan, np.nan)
+
+    main.print_summary(0.0, [0.0, 0.2], summary)
+
+    succeeded_row, failed_row = capsys.readouterr().out.splitlines()[2:]
+    assert "failed" not in succeeded_row
+    assert failed_row.split()[2:] == ["failed"]
@@ -1,11 +1,31 @@
 import pytest
 import netsquid as ns
+import netsquid.components.instructions as instr
+import netsquid.qubits.ketstates as ks
+from src.networking import MessageHeader
 from src.qpu_entity import QPUEntity  # , EmitProgram, CorrectXProgram, CorrectYProgram
+from src.qpu_programs import CorrectXProgram
 from netsquid.components.qprocessor import QuantumProcessor
+from netsquid.components.qprogram import QuantumProgram
 from netsquid.components import Message
+from netsquid.qubits import qubitapi as qapi
 from netsquid.qubits.qubit import Qubit
 
 
+class FailingProgram(QuantumProgram):
+    """Program that initializes qubit 0, then fails on an unsupported instruction."""
+
+    default_num_qubits = 1
+
+    def program(self, **_):
+        q1 = self.get_qubit_indices(self.num_qubits)[0]
+        self.apply(instr.INSTR_INIT, q1)
+        yield self.run()
+        # The T gate is not one of the QPU's physical instructions
+        self.apply(instr.INSTR_T, q1)
+        yield self.run()
+
+
 @pytest.fixture
 def qpu_entity():
     """Fixture to create a QPUEntity with minimal configuration for testing."""
@@ -22,6 +42,12 @@ def test_qpu_entity_initialization(qpu_entity):
     assert qpu_entity.processor.num_positions == 2
 
 
+def test_negative_depolar_rate_raises():
+    """Test that a negative depolarization rate is rejected."""
+    with pytest.raises(ValueError):
+        QPUEntity(name="TestQPU", depolar_rate=-0.1)
+
+
 def test_emit_output_port(qpu_entity):
     """Test that emit() triggers output on the qout port of QuantumProcessor."""
     # Reset the simulation timer to 0
@@ -37,9 +63,47 @@ def test_emit_output_port(qpu_entity):
     assert isinstance(output_msg.items[0], Qubit), "The emitted item is not a Qubit"
 
 
+def test_emit_header_round_trip(qpu_entity):
+    """Test that an emitted photon leaves the header port with a hashable header."""
+    ns.sim_reset()
+    received = []
+    qpu_entity.processor.ports["qout_hdr"].bind_output_handler(received.append)
+
+    qpu_entity.register_id(7)
+    qpu_entity.emit()
+    ns.sim_run()
+
+    assert len(received) == 1, "The QPU entity does not forward the emitted photon"
+    header = received[0].meta["header"]
+    assert isinstance(header, MessageHeader)
+    assert header.request_id == 7
+    assert header.event_id is not None
+    # Headers are meta values, which must be hashable
+    assert hash(header) == hash(MessageHeader(7, header.event_id))
+
+
 # Test Z correction (two QPUs, one set to correct, one not)
 # Test X correction (two QPUs, one set to correct, one not)
 # Test no correction (two QPUs, one set to correct, one not)
 
+
 # Test queue scheduling
+def test_queued_program_runs_after_failure(qpu_entity):
+    """Test that a program queued behind a failing program still runs."""
+    ns.sim_reset()
+
+    # The failing program occupies the processor, so the correction is queued
+    qpu_entity.add_program(FailingProgram())
+    assert qpu_entity.processor.busy
+    qpu_entity.add_program(CorrectXProgram())
+    assert len(qpu_entity._QPUEntity__queue) == 1
+
+    ns.sim_run()
+
+    # The queued X correction flipped the initialized |0> qubit to |1>
+    assert not qpu_entity._QPUEntity__queue
+    qubit = qpu_entity.get_qubit(0)
+    assert qapi.fidelity(qubit, ks.s1, squared=True) == pytest.approx(1)
+
+
 # Test fidelity emission (just verify qubits go out the correct port)
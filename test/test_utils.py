@@ -0,0 +1,40 @@
+import numpy as np
+
+from src.utils import distilled_fidelity, summarize_batch
+
+
+def test_distilled_fidelity_scalar():
+    """Test the scalar distilled fidelity against its closed form."""
+    assert distilled_fidelity(0.8, 1) == 0.8
+    assert distilled_fidelity(0.8, 2) == 0.64 / (0.64 + 0.04)
+    assert distilled_fidelity(0.0, 2) == 0.0
+
+
+def test_distilled_fidelity_broadcast():
+    """Test that array inputs broadcast to the same values as scalar calls."""
+    fidelities = np.array([0.0, 0.3, 0.5, 0.8, 1.0])
+    n_values = np.array([1, 2, 3, 5])
+
+    grid = distilled_fidelity(fidelities[np.newaxis, :], n_values[:, np.newaxis])
+
+    assert grid.shape == (len(n_values), len(fidelities))
+    expected = [[distilled_fidelity(f, n) for f in fidelities] for n in n_values]
+    np.testing.assert_allclose(grid, expected)
+
+
+def test_summarize_batch():
+    """Test the batch summary against hand-computed statistics."""
+    runs = np.array([[1, 0.9, 2.0], [0, 0.5, 4.0], [1, 0.7, 6.0], [0, 0.1, 8.0]])
+
+    summary = summarize_batch(runs, total_runs=4)
+
+    np.testing.assert_allclose(summary, (0.8, 0.55, 2, 0.5, 5.0))
+
+
+def test_summarize_batch_without_success():
+    """Test that a batch without successful runs has a zero success fidelity."""
+    runs = [(0, 0.4, 1.0), (0, 0.6, 3.0)]
+
+    summary = summarize_batch(runs, total_runs=2)
+
+    np.testing.assert_allclose(summary, (0, 0.5, 0, 0, 2.0))